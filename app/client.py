@@ -1,8 +1,31 @@
 import httpx
 import asyncio
-import json
+import argparse
+import sys
+import orjson
 from typing import Dict, Any
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
+# Separators for the results display
+_EQ = "=" * 80
+_DASH = "-" * 80
+
+# Shared client so repeated requests reuse pooled connections. The transport
+# retries failed connection attempts, and the connect timeout fails fast on
+# an unreachable server.
+_CLIENT = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+    ),
+    timeout=httpx.Timeout(connect=2.0, read=30.0, write=10.0, pool=5.0)
+)
+
 async def fetch_stock_research(ticker: str, period: str = "1wk") -> Dict[str, Any]:
     """
     Fetch stock research from the API
@@ -18,18 +41,17 @@ async def fetch_stock_research(ticker: str, period: str = "1wk") -> Dict[str, An
     
     print(f"📊 Fetching stock research for {ticker} over {period}...")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            url,
-            json={"ticker": ticker, "period": period}
-        )
-        
-        if response.status_code == 200:
-            print("✅ Research complete!")
-            return response.json()
-        else:
-            print(f"❌ Error: {response.status_code} - {response.text}")
-            return {"status": "error", "error": response.text}
+    response = await _CLIENT.post(
+        url,
+        json={"ticker": ticker, "period": period}
+    )
+    
+    if response.status_code == 200:
+        print("✅ Research complete!")
+        return response.json()
+    else:
+        print(f"❌ Error: {response.status_code} - {response.text}")
+        return {"status": "error", "error": response.text}
 
 async def display_research_results(research_results: Dict[str, Any]) -> None:
     """
@@ -42,59 +64,67 @@ async def display_research_results(research_results: Dict[str, Any]) -> None:
         print(f"Error: {research_results.get('error')}")
         return
     
-    print("\n" + "="*80)
-    print(f"STOCK RESEARCH RESULTS FOR {research_results.get('ticker', 'Unknown')}")
-    print("="*80)
+    lines = []
+    lines.append("\n" + _EQ)
+    lines.append(f"STOCK RESEARCH RESULTS FOR {research_results.get('ticker', 'Unknown')}")
+    lines.append(_EQ)
     
     # Stock Data Summary
     stock_data = research_results.get("stock_data", {})
     if stock_data:
-        print(f"\nStock: {stock_data.get('name')} ({research_results.get('ticker')})")
-        print(f"Current Price: ${stock_data.get('current_price', 'N/A')}")
-        print(f"Sector: {stock_data.get('sector', 'Unknown')}")
-        print(f"Industry: {stock_data.get('industry', 'Unknown')}")
+        lines.append(f"\nStock: {stock_data.get('name')} ({research_results.get('ticker')})")
+        lines.append(f"Current Price: ${stock_data.get('current_price', 'N/A')}")
+        lines.append(f"Sector: {stock_data.get('sector', 'Unknown')}")
+        lines.append(f"Industry: {stock_data.get('industry', 'Unknown')}")
     
     # Display the multi-step process that occurred
-    print("\n" + "-"*80)
-    print("MULTI-STEP RESEARCH PROCESS")
-    print("-"*80)
-    print("1. 📈 Fetched stock price data")
-    print("2. 📰 Retrieved relevant news articles")
-    print("3. 🔍 Analyzed price fluctuations")
-    print("4. 📊 Processed news sentiment")
-    print("5. 🔗 Correlated news with price movements")
-    print("6. 💼 Generated investment insights")
-    print("7. 📝 Compiled comprehensive research report")
+    lines.append("\n" + _DASH)
+    lines.append("MULTI-STEP RESEARCH PROCESS")
+    lines.append(_DASH)
+    lines.append("1. 📈 Fetched stock price data")
+    lines.append("2. 📰 Retrieved relevant news articles")
+    lines.append("3. 🔍 Analyzed price fluctuations")
+    lines.append("4. 📊 Processed news sentiment")
+    lines.append("5. 🔗 Correlated news with price movements")
+    lines.append("6. 💼 Generated investment insights")
+    lines.append("7. 📝 Compiled comprehensive research report")
     
     # Fluctuation Analysis
-    print("\n" + "-"*80)
-    print("PRICE FLUCTUATION ANALYSIS")
-    print("-"*80)
-    print(research_results.get("fluctuation_analysis", "No analysis available"))
+    lines.append("\n" + _DASH)
+    lines.append("PRICE FLUCTUATION ANALYSIS")
+    lines.append(_DASH)
+    lines.append(str(research_results.get("fluctuation_analysis", "No analysis available")))
     
     # News Summary
-    print("\n" + "-"*80)
-    print("NEWS SUMMARY")
-    print("-"*80)
-    print(research_results.get("news_summary", "No news summary available"))
+    lines.append("\n" + _DASH)
+    lines.append("NEWS SUMMARY")
+    lines.append(_DASH)
+    lines.append(str(research_results.get("news_summary", "No news summary available")))
     
     # Correlation Analysis
-    print("\n" + "-"*80)
-    print("CORRELATION ANALYSIS")
-    print("-"*80)
-    print(research_results.get("correlation_analysis", "No correlation analysis available"))
+    lines.append("\n" + _DASH)
+    lines.append("CORRELATION ANALYSIS")
+    lines.append(_DASH)
+    lines.append(str(research_results.get("correlation_analysis", "No correlation analysis available")))
     
     # Comprehensive Report
-    print("\n" + "-"*80)
-    print("COMPREHENSIVE REPORT")
-    print("-"*80)
-    print(research_results.get("comprehensive_report", "No comprehensive report available"))
+    lines.append("\n" + _DASH)
+    lines.append("COMPREHENSIVE REPORT")
+    lines.append(_DASH)
+    lines.append(str(research_results.get("comprehensive_report", "No comprehensive report available")))
+    
+    lines.append(f"\n{_EQ}\n")
     
-    print("\n" + "="*80 + "\n")
+    # Write the whole display at once rather than line by line
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
 
-async def main():
+async def main(pretty: bool = False):
     """
     Main function to run the client
+    
+    Args:
+        pretty: Indent the saved research results for reading
     """
     print("Stock Research Client")
     print("---------------------")
@@ -119,10 +149,30 @@ async def main():
     
     # Save results to file
     filename = f"{ticker}_research.json"
-    with open(filename, "w") as f:
-        json.dump(research_results, f, indent=2)
+    option = orjson.OPT_INDENT_2 if pretty else None
+    with open(filename, "wb") as f:
+        f.write(orjson.dumps(research_results, option=option))
     
     print(f"Research results saved to {filename}")
 
+async def run_client(pretty: bool = False):
+    """
+    Run the client and close the shared HTTP client on exit
+    
+    Args:
+        pretty: Indent the saved research results for reading
+    """
+    try:
+        await main(pretty)
+    finally:
+        await _CLIENT.aclose()
+
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Stock Research Client")
+    parser.add_argument("--pretty", action="store_true", help="indent the saved research results")
+    args = parser.parse_args()
+    
+    if uvloop is not None:
+        uvloop.run(run_client(args.pretty))
+    else:
+        asyncio.run(run_client(args.pretty)) 
\ No newline at end of file
@@ -1,11 +1,23 @@
+from contextlib import asynccontextmanager
+from typing import Dict
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import stock_research
+from app.services import news_service
+from app.utils.llm_cache import save_semantic_cache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await news_service.close_client()
+    # Persist caches that are only written on shutdown
+    save_semantic_cache()
 
 app = FastAPI(
     title="Stock Research API",
     description="API for multi-step research linking stock news with price changes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,7 +33,7 @@ app.add_middleware(
 app.include_router(stock_research.router)
 
 @app.get("/")
-async def root():
+async def root() -> Dict[str, str]:
     return {"message": "Welcome to the Stock Research API"}
 
 if __name__ == "__main__":
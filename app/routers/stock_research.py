@@ -1,10 +1,10 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
-import json
 import asyncio
+import orjson
 
-from app.services.stock_service import get_stock_data, analyze_fluctuations
+from app.services.stock_service import get_stock_data, get_company_name, analyze_fluctuations
 from app.services.news_service import get_news_for_stock, extract_key_news_points
 from app.services.correlation_service import correlate_news_with_price_changes, generate_comprehensive_report
 from app.services.stock_functions import (
@@ -13,13 +13,75 @@ from app.services.stock_functions import (
     correlate_news_and_price, 
     generate_investment_insight
 )
-from app.utils.llm import StockAnalysisAgent, query_llm
+from app.utils.llm import AGENT_JSON_GENERATION_CONFIG, StockAnalysisAgent, cached_query_llm
+from app.utils.cache import single_flight
 
 router = APIRouter(
     prefix="/api/stock-research",
     tags=["Stock Research"],
 )
 
+# The agent system prompt has no interpolated fields; the braces are literal
+_AGENT_SYSTEM_PROMPT = """You are a financial analyst agent. Respond with a JSON object with "function" and "params" string fields, choosing EXACTLY ONE of these:
+1. {"function": "analyze_price_data", "params": "{stock_data}"}
+2. {"function": "analyze_news_sentiment", "params": "{news_data}"}
+3. {"function": "correlate_news_and_price", "params": "{combined_data}"}
+4. {"function": "generate_investment_insight", "params": "{correlation_data}"}
+5. {"function": "FINAL_ANALYSIS", "params": "[Your comprehensive analysis of the stock]"}
+
+DO NOT include multiple responses. Give ONE response at a time."""
+
+_RESEARCH_QUERY_TMPL = """I need to analyze the correlation between news events and stock price movements for {name} ({ticker}) over the past week.
+I should analyze the stock price data first, then the news sentiment, then correlate them, and finally generate investment insights."""
+
+_CORRELATION_QUERY_TMPL = """I need to analyze the correlation between news events and stock price movements for {name} ({ticker})."""
+
+_REPORT_PROMPT_TMPL = """Create a comprehensive research report for {name} ({ticker}) with the following information:
+
+STOCK PRICE FLUCTUATION ANALYSIS:
+{fluctuation_analysis}
+
+NEWS SUMMARY:
+{news_summary}
+
+CORRELATION ANALYSIS:
+{correlation_analysis}
+
+Format your response as a professional investment research report with clear sections and actionable insights."""
+
+def _slim_stock(stock_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the stock fields the agent's price analysis reads"""
+    return {
+        "symbol": stock_data['symbol'],
+        "name": stock_data['name'],
+        "current_price": stock_data['current_price'],
+        "daily_changes": [
+            {
+                "date": change['date'],
+                "close": change['close'],
+                "percent_change": change['percent_change']
+            } for change in stock_data['daily_changes']
+        ]
+    }
+
+def _slim_news(news_articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only the article fields the agent's news analysis reads"""
+    return [
+        {
+            "title": article['title'],
+            "description": article['short_description'],
+            "source": article['source'],
+            "published_at": article['published_at']
+        } for article in news_articles
+    ]
+
+async def _settle(tasks: List[asyncio.Task]) -> None:
+    """Cancel the prefetch tasks the agent didn't use and collect their outcomes"""
+    for task in tasks:
+        task.cancel()
+    # Retrieving the results keeps failures from being logged as never retrieved
+    await asyncio.gather(*tasks, return_exceptions=True)
+
 class ResearchRequest(BaseModel):
     ticker: str
     period: str = "1wk"
@@ -39,101 +101,107 @@ async def research_stock(request: ResearchRequest):
     """
     Perform multi-step research on a stock, analyzing price movements and related news
     """
+    # The payload is built from our own services, so it is serialized by
+    # Pydantic without re-validating it against ResearchResponse; returning
+    # the response directly keeps FastAPI from validating it again
+    payload = await _run_research(request.ticker, request.period)
+    return Response(ResearchResponse.model_construct(**payload).model_dump_json(), media_type="application/json")
+
+@single_flight
+async def _run_research(ticker: str, period: str) -> Dict[str, Any]:
+    """
+    Run the research pipeline, sharing one run between concurrent identical requests
+    """
+    prefetch_tasks: List[asyncio.Task] = []
     try:
         # Step 1: Get stock data
-        stock_data = await get_stock_data(request.ticker, request.period)
+        stock_data = await get_stock_data(ticker, period)
         if not stock_data:
-            raise HTTPException(status_code=404, detail=f"Stock data not found for ticker {request.ticker}")
+            raise HTTPException(status_code=404, detail=f"Stock data not found for ticker {ticker}")
         
-        # Step 2: Get news articles for the stock
-        news_articles = await get_news_for_stock(stock_data['name'], request.ticker, days=7)
+        # Step 2: Get news articles for the stock while analyzing price fluctuations
+        fluctuation_task = asyncio.create_task(analyze_fluctuations(stock_data))
+        news_task = asyncio.create_task(get_news_for_stock(stock_data['name'], ticker, days=7))
+        news = await news_task
         
         # Step 3: Set up the agent for correlation analysis
-        agent = StockAnalysisAgent(max_iterations=4)
-        
-        # Define the system prompt
-        system_prompt = """You are a financial analyst agent. Respond with EXACTLY ONE of these formats:
-1. FUNCTION_CALL: analyze_price_data|{stock_data}
-2. FUNCTION_CALL: analyze_news_sentiment|{news_data}
-3. FUNCTION_CALL: correlate_news_and_price|{combined_data}
-4. FUNCTION_CALL: generate_investment_insight|{correlation_data}
-5. FINAL_ANALYSIS: [Your comprehensive analysis of the stock]
-
-DO NOT include multiple responses. Give ONE response at a time."""
+        agent = StockAnalysisAgent(max_iterations=4, generation_config=AGENT_JSON_GENERATION_CONFIG)
         
-        agent.set_system_prompt(system_prompt)
+        agent.set_system_prompt(_AGENT_SYSTEM_PROMPT)
         
         # Set the initial query
-        initial_query = f"""I need to analyze the correlation between news events and stock price movements for {stock_data['name']} ({request.ticker}) over the past week.
-I should analyze the stock price data first, then the news sentiment, then correlate them, and finally generate investment insights."""
+        agent.set_initial_query(_RESEARCH_QUERY_TMPL.format_map({"name": stock_data['name'], "ticker": ticker}))
+        
+        # Serialize the agent payloads once rather than on every iteration
+        stock_payload = orjson.dumps(_slim_stock(stock_data)).decode()
+        news_payload = orjson.dumps(_slim_news(news['articles'])).decode()
         
-        agent.set_initial_query(initial_query)
+        # Prefetch the two independent analyses while the agent plans its first step
+        price_task = asyncio.create_task(asyncio.to_thread(analyze_price_data, stock_payload))
+        news_analysis_task = asyncio.create_task(asyncio.to_thread(analyze_news_sentiment, news_payload))
+        prefetch_tasks.extend([price_task, news_analysis_task])
         
         # Define function map
         function_map = {
-            "analyze_price_data": lambda params: analyze_price_data(params if isinstance(params, str) else json.dumps(stock_data)),
-            "analyze_news_sentiment": lambda params: analyze_news_sentiment(params if isinstance(params, str) else json.dumps(news_articles)),
+            "analyze_price_data": lambda params: price_task,
+            "analyze_news_sentiment": lambda params: news_analysis_task,
             "correlate_news_and_price": correlate_news_and_price,
             "generate_investment_insight": generate_investment_insight
         }
         
-        # Run the agent until completion
-        correlation_analysis = await agent.run_until_completion(
+        # Run the agent until completion while summarizing the news
+        news_summary_task = asyncio.create_task(extract_key_news_points(news))
+        correlation_task = asyncio.create_task(agent.run_until_completion(
             function_map=function_map,
             completion_marker="FINAL_ANALYSIS"
+        ))
+        fluctuation_analysis, news_summary, correlation_analysis = await asyncio.gather(
+            fluctuation_task, news_summary_task, correlation_task
         )
         
         # Generate the comprehensive report
-        system_prompt = """You are an investment research report writer creating a final report.
-Based on all the previous analysis steps, create a comprehensive research report with these sections:
-1. Executive Summary
-2. Stock Price Analysis
-3. News Summary
-4. News-Price Correlation Analysis
-5. Investment Strategy Recommendations
-6. Conclusion"""
-        
-        # Prepare input for the report
-        fluctuation_analysis = await analyze_fluctuations(stock_data)
-        news_summary = await extract_key_news_points(news_articles)
-        
-        final_prompt = f"""Create a comprehensive research report for {stock_data['name']} ({request.ticker}) with the following information:
-
-STOCK PRICE FLUCTUATION ANALYSIS:
-{fluctuation_analysis}
-
-NEWS SUMMARY:
-{news_summary}
-
-CORRELATION ANALYSIS:
-{correlation_analysis}
-
-Format your response as a professional investment research report with clear sections and actionable insights."""
+        final_prompt = _REPORT_PROMPT_TMPL.format_map({
+            "name": stock_data['name'],
+            "ticker": ticker,
+            "fluctuation_analysis": fluctuation_analysis,
+            "news_summary": news_summary,
+            "correlation_analysis": correlation_analysis
+        })
         
-        comprehensive_report = await query_llm(final_prompt)
+        comprehensive_report = await cached_query_llm(final_prompt, tier="pro", stream=True)
         
         # Return the complete analysis
-        return ResearchResponse(
-            ticker=request.ticker,
-            stock_data=stock_data,
-            fluctuation_analysis=fluctuation_analysis,
-            news_summary=news_summary,
-            correlation_analysis=correlation_analysis,
-            comprehensive_report=comprehensive_report
-        )
+        return {
+            "ticker": ticker,
+            "stock_data": stock_data,
+            "fluctuation_analysis": fluctuation_analysis,
+            "news_summary": news_summary,
+            "correlation_analysis": correlation_analysis,
+            "comprehensive_report": comprehensive_report,
+            "status": "success",
+            "error": None
+        }
     
     except Exception as e:
-        return ResearchResponse(
-            ticker=request.ticker,
-            status="error",
-            error=str(e)
-        )
+        return {
+            "ticker": ticker,
+            "stock_data": None,
+            "fluctuation_analysis": None,
+            "news_summary": None,
+            "correlation_analysis": None,
+            "comprehensive_report": None,
+            "status": "error",
+            "error": str(e)
+        }
+    
+    finally:
+        await _settle(prefetch_tasks)
 
 @router.get("/stock-data/{ticker}")
 async def get_stock_data_endpoint(
     ticker: str, 
     period: str = Query("1wk", description="Time period for stock data (e.g., 1d, 1wk, 1mo)")
-):
+) -> Dict[str, Any]:
     """
     Get stock data for a given ticker
     """
@@ -151,23 +219,23 @@ async def get_stock_data_endpoint(
 async def get_news_endpoint(
     ticker: str,
     days: int = Query(7, description="Number of days to look back for news")
-):
+) -> Dict[str, Any]:
     """
     Get news articles for a stock
     """
     try:
-        # First get the stock data to get the company name
-        stock_data = await get_stock_data(ticker)
-        if not stock_data:
-            raise HTTPException(status_code=404, detail=f"Stock data not found for ticker {ticker}")
+        # Only the company name is needed, not the price history
+        company_name = await get_company_name(ticker)
+        if not company_name:
+            raise HTTPException(status_code=404, detail=f"Company not found for ticker {ticker}")
         
-        news_articles = await get_news_for_stock(stock_data['name'], ticker, days)
-        news_summary = await extract_key_news_points(news_articles)
+        news = await get_news_for_stock(company_name, ticker, days)
+        news_summary = await extract_key_news_points(news)
         
         return {
             "ticker": ticker,
-            "company_name": stock_data['name'],
-            "news_articles": news_articles,
+            "company_name": company_name,
+            "news_articles": news['articles'],
             "news_summary": news_summary
         }
     
@@ -178,10 +246,11 @@ async def get_news_endpoint(
 async def get_correlation_endpoint(
     ticker: str,
     period: str = Query("1wk", description="Time period for stock data (e.g., 1d, 1wk, 1mo)")
-):
+) -> Dict[str, Any]:
     """
     Analyze correlation between news and stock price changes using agent-based approach
     """
+    prefetch_tasks: List[asyncio.Task] = []
     try:
         # Get stock data
         stock_data = await get_stock_data(ticker, period)
@@ -189,32 +258,29 @@ async def get_correlation_endpoint(
             raise HTTPException(status_code=404, detail=f"Stock data not found for ticker {ticker}")
         
         # Get news articles
-        news_articles = await get_news_for_stock(stock_data['name'], ticker, days=7)
+        news = await get_news_for_stock(stock_data['name'], ticker, days=7)
         
         # Set up the agent for correlation analysis
-        agent = StockAnalysisAgent(max_iterations=4)
-        
-        # Define the system prompt
-        system_prompt = """You are a financial analyst agent. Respond with EXACTLY ONE of these formats:
-1. FUNCTION_CALL: analyze_price_data|{stock_data}
-2. FUNCTION_CALL: analyze_news_sentiment|{news_data}
-3. FUNCTION_CALL: correlate_news_and_price|{combined_data}
-4. FUNCTION_CALL: generate_investment_insight|{correlation_data}
-5. FINAL_ANALYSIS: [Your comprehensive analysis of the stock]
-
-DO NOT include multiple responses. Give ONE response at a time."""
+        agent = StockAnalysisAgent(max_iterations=4, generation_config=AGENT_JSON_GENERATION_CONFIG)
         
-        agent.set_system_prompt(system_prompt)
+        agent.set_system_prompt(_AGENT_SYSTEM_PROMPT)
         
         # Set the initial query
-        initial_query = f"""I need to analyze the correlation between news events and stock price movements for {stock_data['name']} ({ticker})."""
+        agent.set_initial_query(_CORRELATION_QUERY_TMPL.format_map({"name": stock_data['name'], "ticker": ticker}))
+        
+        # Serialize the agent payloads once rather than on every iteration
+        stock_payload = orjson.dumps(_slim_stock(stock_data)).decode()
+        news_payload = orjson.dumps(_slim_news(news['articles'])).decode()
         
-        agent.set_initial_query(initial_query)
+        # Prefetch the two independent analyses while the agent plans its first step
+        price_task = asyncio.create_task(asyncio.to_thread(analyze_price_data, stock_payload))
+        news_analysis_task = asyncio.create_task(asyncio.to_thread(analyze_news_sentiment, news_payload))
+        prefetch_tasks.extend([price_task, news_analysis_task])
         
         # Define function map
         function_map = {
-            "analyze_price_data": lambda params: analyze_price_data(params if isinstance(params, str) else json.dumps(stock_data)),
-            "analyze_news_sentiment": lambda params: analyze_news_sentiment(params if isinstance(params, str) else json.dumps(news_articles)),
+            "analyze_price_data": lambda params: price_task,
+            "analyze_news_sentiment": lambda params: news_analysis_task,
             "correlate_news_and_price": correlate_news_and_price,
             "generate_investment_insight": generate_investment_insight
         }
@@ -232,4 +298,7 @@ DO NOT include multiple responses. Give ONE response at a time."""
         }
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        await _settle(prefetch_tasks) 
\ No newline at end of file
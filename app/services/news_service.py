@@ -1,14 +1,55 @@
-from newsapi import NewsApiClient
 import httpx
+from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from app.utils.config import NEWSAPI_KEY
+from app.utils.cache import disk_ttl, ttl_lru
 
-news_api = NewsApiClient(api_key=NEWSAPI_KEY)
+NEWSAPI_URL = "https://newsapi.org/v2/everything"
 
-async def get_news_for_stock(company_name: str, ticker: str, days: int = 7) -> List[Dict[str, Any]]:
+# Descriptions are capped once at ingestion into short_description, which the
+# prompts use as is; description keeps the raw News API value for the API
+_MAX_DESCRIPTION_CHARS = 200
+
+# Shared client so News API requests reuse pooled connections; created on
+# first use and again after close_client, e.g. for a new app lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+def _get_client() -> httpx.AsyncClient:
+    """
+    Return the shared News API client, creating it if it is missing or closed
     """
-    Get news articles related to a stock
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=10.0)
+    return _client
+
+async def get_news_for_stock(company_name: str, ticker: str, days: int = 7) -> Dict[str, Any]:
+    """
+    Get news articles related to a stock, grouped by date once for all consumers
+    
+    Args:
+        company_name: The name of the company
+        ticker: The stock ticker symbol
+        days: Number of days to look back for news
+        
+    Returns:
+        Dictionary with the list of news articles under "articles" and the
+        same articles grouped by published date under "by_date"
+    """
+    articles = await _fetch_news(company_name, ticker, days)
+    
+    by_date = defaultdict(list)
+    for article in articles:
+        by_date[article['published_at']].append(article)
+    
+    return {"articles": articles, "by_date": dict(by_date)}
+
+@ttl_lru(maxsize=1024, ttl=60)
+@disk_ttl("news_v2", ttl=3600)
+async def _fetch_news(company_name: str, ticker: str, days: int) -> List[Dict[str, Any]]:
+    """
+    Fetch news articles related to a stock from the News API
     
     Args:
         company_name: The name of the company
@@ -31,30 +72,33 @@ async def get_news_for_stock(company_name: str, ticker: str, days: int = 7) -> L
         query = f"{company_name} OR {ticker}"
         
         # Get news from the News API
-        response = news_api.get_everything(
-            q=query,
-            from_param=from_date_str,
-            to=to_date_str,
-            language='en',
-            sort_by='relevancy',
-            page_size=25
+        response = await _get_client().get(
+            NEWSAPI_URL,
+            params={
+                "q": query,
+                "from": from_date_str,
+                "to": to_date_str,
+                "language": "en",
+                "sortBy": "relevancy",
+                "pageSize": 25,
+                "apiKey": NEWSAPI_KEY
+            }
         )
+        response.raise_for_status()
         
         # Process and filter the results
-        articles = response.get('articles', [])
+        articles = response.json().get('articles', [])
         processed_articles = []
         
         for article in articles:
-            # Extract date in a standardized format
-            published_at = datetime.strptime(article['publishedAt'], "%Y-%m-%dT%H:%M:%SZ")
-            date_str = published_at.strftime("%Y-%m-%d")
-            
             processed_articles.append({
                 'title': article['title'],
                 'description': article['description'],
+                'short_description': (article['description'] or "")[:_MAX_DESCRIPTION_CHARS],
                 'url': article['url'],
                 'source': article['source']['name'],
-                'published_at': date_str,
+                # publishedAt is ISO 8601 (YYYY-MM-DDTHH:MM:SSZ), so the date is its prefix
+                'published_at': article['publishedAt'][:10],
                 'content': article.get('content', '')
             })
         
@@ -64,42 +108,41 @@ async def get_news_for_stock(company_name: str, ticker: str, days: int = 7) -> L
         print(f"Error fetching news for {company_name} ({ticker}): {e}")
         return []
 
-async def extract_key_news_points(news_articles: List[Dict[str, Any]]) -> str:
+async def extract_key_news_points(news: Dict[str, Any]) -> str:
     """
     Extract key points from news articles
     
     Args:
-        news_articles: List of news articles
+        news: News as returned by get_news_for_stock
         
     Returns:
         String summarizing key points from the news
     """
-    if not news_articles:
+    if not news['articles']:
         return "No news articles found for the specified period."
     
-    # Group articles by date
-    articles_by_date = {}
-    for article in news_articles:
-        date = article['published_at']
-        if date not in articles_by_date:
-            articles_by_date[date] = []
-        articles_by_date[date].append(article)
-    
     # Create a summary
     summary = "News Summary:\n\n"
     
-    for date, articles in sorted(articles_by_date.items()):
+    for date, articles in sorted(news['by_date'].items()):
         summary += f"Date: {date}\n"
         summary += f"Number of articles: {len(articles)}\n"
         
         for i, article in enumerate(articles[:3]):  # Limit to top 3 articles per day
             summary += f"  {i+1}. {article['title']} (Source: {article['source']})\n"
-            if article['description']:
-                summary += f"     {article['description'][:150]}{'...' if len(article['description']) > 150 else ''}\n"
+            if article['short_description']:
+                summary += f"     {article['short_description']}\n"
         
         if len(articles) > 3:
             summary += f"  ... and {len(articles) - 3} more articles\n"
         
         summary += "\n"
     
-    return summary 
\ No newline at end of file
+    return summary
+
+async def close_client() -> None:
+    """
+    Close the shared News API client
+    """
+    if _client is not None:
+        await _client.aclose()
@@ -1,6 +1,44 @@
-from typing import Dict, List, Any, Union
-import json
+from typing import Callable, Dict, List, Any, Union
+import functools
+from collections import Counter, defaultdict
+import numpy as np
+import orjson
 
+def _memoize_json(func: Callable[[str], Dict[str, Any]]) -> Callable[[Union[str, Any]], Dict[str, Any]]:
+    """
+    Cache a JSON-in, dict-out analysis function on its raw input string
+    
+    Non-string inputs are serialized first so they share the cache. Cached
+    results are shared between callers and must not be mutated.
+    """
+    cached = functools.lru_cache(maxsize=256)(func)
+    
+    @functools.wraps(func)
+    def wrapper(data):
+        if not isinstance(data, str):
+            data = orjson.dumps(data).decode()
+        return cached(data)
+    
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+def daily_change_array(daily_changes: List[Dict[str, Any]], field: str) -> np.ndarray:
+    """
+    Collect one numeric field of the daily change records into an array
+    
+    Only the fields a caller computes on are converted; the records stay
+    the source of truth for everything else.
+    
+    Args:
+        daily_changes: List of daily change records
+        field: Name of the numeric field, e.g. percent_change
+        
+    Returns:
+        Float array with the field's value for each day, 0 where missing
+    """
+    return np.fromiter((change.get(field, 0) for change in daily_changes), dtype=np.float64, count=len(daily_changes))
+
+@_memoize_json
 def analyze_price_data(ticker_data: str) -> Dict[str, Any]:
     """
     Analyze stock price data
@@ -13,7 +51,7 @@ def analyze_price_data(ticker_data: str) -> Dict[str, Any]:
     """
     # Parse the input data if it's a string
     if isinstance(ticker_data, str):
-        ticker_data = json.loads(ticker_data)
+        ticker_data = orjson.loads(ticker_data)
     
     daily_changes = ticker_data.get('daily_changes', [])
     
@@ -23,25 +61,15 @@ def analyze_price_data(ticker_data: str) -> Dict[str, Any]:
             "message": "No daily price changes found in data"
         }
     
-    # Calculate statistics
-    total_change = 0
-    up_days = 0
-    down_days = 0
-    
-    for change in daily_changes:
-        percent_change = change.get('percent_change', 0)
-        total_change += percent_change
-        
-        if percent_change > 0:
-            up_days += 1
-        elif percent_change < 0:
-            down_days += 1
-    
-    avg_change = total_change / len(daily_changes) if daily_changes else 0
+    # Calculate statistics on contiguous arrays
+    percent_changes = daily_change_array(daily_changes, 'percent_change')
+    avg_change = float(percent_changes.mean())
+    up_days = int((percent_changes > 0).sum())
+    down_days = int((percent_changes < 0).sum())
     
     # Find max gain and loss days
-    max_gain = max(daily_changes, key=lambda x: x.get('percent_change', 0)) if daily_changes else {}
-    max_loss = min(daily_changes, key=lambda x: x.get('percent_change', 0)) if daily_changes else {}
+    max_gain = daily_changes[int(percent_changes.argmax())]
+    max_loss = daily_changes[int(percent_changes.argmin())]
     
     # Prepare the result
     result = {
@@ -66,6 +94,7 @@ def analyze_price_data(ticker_data: str) -> Dict[str, Any]:
     
     return result
 
+@_memoize_json
 def analyze_news_sentiment(news_data: str) -> Dict[str, Any]:
     """
     Organize and partially analyze news data
@@ -78,36 +107,30 @@ def analyze_news_sentiment(news_data: str) -> Dict[str, Any]:
     """
     # Parse the input data if it's a string
     if isinstance(news_data, str):
-        news_data = json.loads(news_data)
+        news_data = orjson.loads(news_data)
     
     # Organize articles by date
-    articles_by_date = {}
+    articles_by_date = defaultdict(list)
     for article in news_data:
         date = article.get('published_at', '')
         if date:
-            if date not in articles_by_date:
-                articles_by_date[date] = []
             articles_by_date[date].append(article)
     
     # Count articles by source
-    sources = {}
-    for article in news_data:
-        source = article.get('source', '')
-        if source:
-            sources[source] = sources.get(source, 0) + 1
+    sources = Counter(article.get('source') for article in news_data if article.get('source'))
     
     # Prepare the result
     result = {
         "total_articles": len(news_data),
         "days_with_news": len(articles_by_date),
         "articles_by_date": {date: len(articles) for date, articles in articles_by_date.items()},
-        "top_sources": sorted([{"source": s, "count": c} for s, c in sources.items()], 
-                             key=lambda x: x["count"], reverse=True)[:5],
+        "top_sources": [{"source": s, "count": c} for s, c in sources.most_common(5)],
         "date_range": [min(articles_by_date.keys()), max(articles_by_date.keys())] if articles_by_date else []
     }
     
     return result
 
+@_memoize_json
 def correlate_news_and_price(data: str) -> Dict[str, Any]:
     """
     Process combined stock and news data to find correlations
@@ -120,7 +143,7 @@ def correlate_news_and_price(data: str) -> Dict[str, Any]:
     """
     # Parse the input data if it's a string
     if isinstance(data, str):
-        data = json.loads(data)
+        data = orjson.loads(data)
     
     # Analyze days with news vs. days without news
     days_with_news = []
@@ -167,6 +190,7 @@ def correlate_news_and_price(data: str) -> Dict[str, Any]:
     
     return result
 
+@_memoize_json
 def generate_investment_insight(correlation_data: str) -> Dict[str, Any]:
     """
     Generate investment insights based on correlation analysis
@@ -179,7 +203,7 @@ def generate_investment_insight(correlation_data: str) -> Dict[str, Any]:
     """
     # Parse the input data if it's a string
     if isinstance(correlation_data, str):
-        correlation_data = json.loads(correlation_data)
+        correlation_data = orjson.loads(correlation_data)
     
     # Extract key information
     has_correlation = correlation_data.get("has_correlation", False)
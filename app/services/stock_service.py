@@ -2,7 +2,31 @@ import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
+from app.utils.cache import disk_ttl, ttl_lru
+from app.services.stock_functions import daily_change_array
 
+def _company_name(info: Dict[str, Any], ticker: str) -> Optional[str]:
+    """
+    Read the company name from yfinance info
+    
+    yfinance often returns a near-empty info dict for unknown symbols rather
+    than raising, so a symbol only counts as resolved when its info has a
+    quote type and a name or symbol. Resolved symbols without a long name
+    fall back to the ticker.
+    
+    Args:
+        info: The yfinance info dictionary
+        ticker: The stock ticker symbol
+        
+    Returns:
+        The company name or None if the symbol did not resolve
+    """
+    if not info.get('quoteType') or not any(info.get(key) for key in ('longName', 'shortName', 'symbol')):
+        return None
+    return info.get('longName') or ticker
+
+@ttl_lru(maxsize=1024, ttl=60)
+@disk_ttl("stock_data", ttl=3600)
 async def get_stock_data(ticker: str, period: str = "1wk") -> Optional[Dict[str, Any]]:
     """
     Get stock data for a given ticker
@@ -32,35 +56,30 @@ async def get_stock_data(ticker: str, period: str = "1wk") -> Optional[Dict[str,
         # Get historical data
         hist = stock.history(start=start_date, end=end_date)
         
-        # Convert to dictionary format for easier handling
         if hist.empty:
             return None
         
-        hist_dict = hist.reset_index().to_dict('records')
+        last_close = float(hist['Close'].iloc[-1])
+        
+        # Calculate daily changes on whole columns, then convert once
+        hist['prev_close'] = hist['Close'].shift(1)
+        hist['change'] = hist['Close'] - hist['prev_close']
+        hist['percent_change'] = hist['Close'].pct_change() * 100
+        hist = hist.dropna(subset=['prev_close'])
+        hist['date'] = hist.index.strftime('%Y-%m-%d')
         
-        # Calculate daily changes
-        daily_changes = []
-        for i in range(1, len(hist_dict)):
-            prev_close = hist_dict[i-1]['Close']
-            curr_close = hist_dict[i]['Close']
-            percent_change = ((curr_close - prev_close) / prev_close) * 100
-            
-            daily_changes.append({
-                'date': hist_dict[i]['Date'].strftime('%Y-%m-%d'),
-                'close': curr_close,
-                'prev_close': prev_close,
-                'change': curr_close - prev_close,
-                'percent_change': percent_change,
-                'volume': hist_dict[i]['Volume']
-            })
+        daily_changes = hist[['date', 'Close', 'prev_close', 'change', 'percent_change', 'Volume']].rename(
+            columns={'Close': 'close', 'Volume': 'volume'}
+        ).to_dict('records')
         
         # Get basic stock info
         stock_info = {
-            'name': info.get('longName', ticker),
+            # The price history already shows the symbol exists
+            'name': _company_name(info, ticker) or ticker,
             'symbol': ticker,
             'sector': info.get('sector', 'Unknown'),
             'industry': info.get('industry', 'Unknown'),
-            'current_price': info.get('currentPrice', hist_dict[-1]['Close'] if hist_dict else None),
+            'current_price': info.get('currentPrice', last_close),
             'daily_changes': daily_changes
         }
         
@@ -70,6 +89,26 @@ async def get_stock_data(ticker: str, period: str = "1wk") -> Optional[Dict[str,
         print(f"Error fetching stock data for {ticker}: {e}")
         return None
 
+@ttl_lru(maxsize=4096, ttl=86400)
+async def get_company_name(ticker: str) -> Optional[str]:
+    """
+    Get the company name for a given ticker
+    
+    The name is a static attribute, so it is cached far longer than price data.
+    
+    Args:
+        ticker: The stock ticker symbol
+        
+    Returns:
+        The company name, as in get_stock_data, or None if the ticker could not be resolved
+    """
+    try:
+        return _company_name(yf.Ticker(ticker).info, ticker)
+    
+    except Exception as e:
+        print(f"Error fetching company name for {ticker}: {e}")
+        return None
+
 async def analyze_fluctuations(stock_data: Dict[str, Any]) -> str:
     """
     Analyze stock price fluctuations
@@ -85,22 +124,27 @@ async def analyze_fluctuations(stock_data: Dict[str, Any]) -> str:
     
     daily_changes = stock_data['daily_changes']
     
-    max_gain = max(daily_changes, key=lambda x: x['percent_change'])
-    max_loss = min(daily_changes, key=lambda x: x['percent_change'])
+    # Calculate statistics on a contiguous array
+    percent_changes = daily_change_array(daily_changes, 'percent_change')
     
-    avg_change = sum(item['percent_change'] for item in daily_changes) / len(daily_changes)
+    max_gain = daily_changes[int(percent_changes.argmax())]
+    max_loss = daily_changes[int(percent_changes.argmin())]
     
-    analysis = f"Stock: {stock_data['name']} ({stock_data['symbol']})\n"
-    analysis += f"Sector: {stock_data['sector']}, Industry: {stock_data['industry']}\n"
-    analysis += f"Current Price: ${stock_data['current_price']:.2f}\n\n"
-    analysis += f"Analysis Period: {daily_changes[0]['date']} to {daily_changes[-1]['date']}\n"
-    analysis += f"Average Daily Change: {avg_change:.2f}%\n"
-    analysis += f"Biggest Gain: {max_gain['percent_change']:.2f}% on {max_gain['date']}\n"
-    analysis += f"Biggest Loss: {max_loss['percent_change']:.2f}% on {max_loss['date']}\n\n"
+    avg_change = percent_changes.mean()
     
-    analysis += "Daily Changes:\n"
-    for change in daily_changes:
-        direction = "↑" if change['percent_change'] > 0 else "↓"
-        analysis += f"{change['date']}: {change['percent_change']:.2f}% {direction} (${change['close']:.2f})\n"
+    parts = [
+        f"Stock: {stock_data['name']} ({stock_data['symbol']})\n",
+        f"Sector: {stock_data['sector']}, Industry: {stock_data['industry']}\n",
+        f"Current Price: ${stock_data['current_price']:.2f}\n\n",
+        f"Analysis Period: {daily_changes[0]['date']} to {daily_changes[-1]['date']}\n",
+        f"Average Daily Change: {avg_change:.2f}%\n",
+        f"Biggest Gain: {max_gain['percent_change']:.2f}% on {max_gain['date']}\n",
+        f"Biggest Loss: {max_loss['percent_change']:.2f}% on {max_loss['date']}\n\n",
+        "Daily Changes:\n"
+    ]
+    parts.extend(
+        f"{change['date']}: {change['percent_change']:.2f}% {'↑' if change['percent_change'] > 0 else '↓'} (${change['close']:.2f})\n"
+        for change in daily_changes
+    )
     
-    return analysis 
\ No newline at end of file
+    return "".join(parts)
\ No newline at end of file
@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import inspect
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from cachetools import TTLCache
+from diskcache import Cache
+from app.utils.config import CACHE_DIR
+
+def _call_key(signature: inspect.Signature, args: tuple, kwargs: dict) -> Hashable:
+    """Build a cache key from call arguments, with defaults applied"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple(bound.arguments.values())
+
+def single_flight(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Coalesce concurrent calls of an async function with the same arguments
+
+    The first caller starts the call; callers arriving while it is in flight
+    await the same result (or exception) instead of starting their own.
+
+    Args:
+        func: Async function to wrap
+
+    Returns:
+        Wrapped async function
+    """
+    signature = inspect.signature(func)
+    inflight: Dict[Hashable, asyncio.Task] = {}
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        key = _call_key(signature, args, kwargs)
+
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            inflight[key] = task
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+
+        # Shield so a cancelled caller doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+    return wrapper
+
+def ttl_lru(maxsize: int = 1024, ttl: float = 60) -> Callable:
+    """
+    Cache the results of an async function in a TTL LRU cache
+
+    Results are keyed on the bound call arguments, so defaulted and explicit
+    arguments share an entry. Concurrent calls with the same arguments await
+    a single in-flight call. Empty results (None, [], {}) are not cached so
+    failed upstream lookups are retried on the next call. Cached results are
+    shared between callers and must not be mutated.
+
+    Args:
+        maxsize: Maximum number of cached results
+        ttl: Time in seconds a cached result stays valid
+
+    Returns:
+        Decorator for an async function
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        signature = inspect.signature(func)
+        cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        shared = single_flight(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = _call_key(signature, args, kwargs)
+
+            if key in cache:
+                return cache[key]
+
+            result = await shared(*args, **kwargs)
+            if result:
+                cache[key] = result
+            return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
+
+def disk_ttl(name: str, ttl: float = 3600) -> Callable:
+    """
+    Persist the results of an async function in an on-disk cache
+
+    Results survive restarts and are shared between worker processes. Like
+    ttl_lru, results are keyed on the bound call arguments and empty results
+    are not cached. Stack ttl_lru on top to serve hot keys from memory.
+
+    Args:
+        name: Cache directory name under CACHE_DIR
+        ttl: Time in seconds a cached result stays valid
+
+    Returns:
+        Decorator for an async function
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        signature = inspect.signature(func)
+        cache = Cache(os.path.join(CACHE_DIR, name))
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = _call_key(signature, args, kwargs)
+
+            result = cache.get(key)
+            if result is not None:
+                return result
+
+            result = await func(*args, **kwargs)
+            if result:
+                cache.set(key, result, expire=ttl)
+            return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
@@ -12,4 +12,10 @@ if not GOOGLE_API_KEY:
 # News API key
 NEWSAPI_KEY = os.getenv("NEWSAPI_KEY")
 if not NEWSAPI_KEY:
-    raise ValueError("NEWSAPI_KEY environment variable is not set") 
\ No newline at end of file
+    raise ValueError("NEWSAPI_KEY environment variable is not set")
+
+# Directory for persistent caches
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+# Match near-duplicate prompts against cached LLM responses by embedding
+LLM_SEMANTIC_CACHE = os.getenv("LLM_SEMANTIC_CACHE") == "1"
@@ -1,41 +1,165 @@
+import inspect
+import logging
+import re
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import orjson
 import google.generativeai as genai
 from app.utils.config import GOOGLE_API_KEY
+from app.utils.llm_cache import llm_response_cache, query_semaphore
+
+logger = logging.getLogger(__name__)
 
 # Configure the Gemini API
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# Initialize the model
-model = genai.GenerativeModel("gemini-pro")
+# Initialize the models: the cheaper, faster flash tier handles short
+# command-style prompts, and pro is reserved for the final reports
+_pro = genai.GenerativeModel("gemini-pro")
+_flash = genai.GenerativeModel("gemini-1.5-flash")
+_models = {"pro": _pro, "flash": _flash}
+
+# Generation config for agents prompted to answer in JSON, so each step parses
+# in one pass; a final answer comes back as the FINAL_ANALYSIS function
+AGENT_JSON_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "OBJECT",
+        "properties": {
+            "function": {"type": "STRING"},
+            "params": {"type": "STRING"}
+        },
+        "required": ["function", "params"]
+    }
+}
+
+# Fallback for responses in the plain-text FUNCTION_CALL format
+_FC_RE = re.compile(r"FUNCTION_CALL:\s*(\w+)\s*\|\s*(.*)", re.S)
 
-async def query_llm(prompt: str) -> str:
+# Longest digest of a function result kept once it leaves the history window;
+# enough for the key figures of the analysis tools' results
+_DIGEST_CHARS = 600
+
+async def stream_llm(
+    prompt: str,
+    tier: str = "flash",
+    generation_config: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Send a query to the Gemini LLM and yield the response text as it is generated
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        tier: Model tier to use, "flash" or "pro"
+        generation_config: Optional Gemini generation config, e.g. for JSON output
+        
+    Yields:
+        Chunks of the LLM's response
+    """
+    async with query_semaphore:
+        response = await _models[tier].generate_content_async(
+            prompt, generation_config=generation_config, stream=True
+        )
+        async for chunk in response:
+            yield chunk.text
+
+async def query_llm(
+    prompt: str,
+    tier: str = "flash",
+    stream: bool = False,
+    generation_config: Optional[Dict[str, Any]] = None
+) -> str:
     """
     Send a query to the Gemini LLM and get the response
     
     Args:
         prompt: The prompt to send to the LLM
+        tier: Model tier to use, "flash" or "pro"
+        stream: Receive the response in chunks as it is generated, for long responses
+        generation_config: Optional Gemini generation config, e.g. for JSON output
         
     Returns:
         The LLM's response as a string
     """
     try:
-        response = model.generate_content(prompt)
+        if stream:
+            return "".join([chunk async for chunk in stream_llm(prompt, tier, generation_config)])
+        
+        async with query_semaphore:
+            response = await _models[tier].generate_content_async(prompt, generation_config=generation_config)
         return response.text
     except Exception as e:
-        print(f"Error querying LLM: {e}")
+        logger.error("Error querying LLM: %s", e)
         return f"Error: {str(e)}"
 
+@llm_response_cache(ignore=("stream",))
+async def cached_query_llm(
+    prompt: str,
+    tier: str = "flash",
+    stream: bool = False,
+    generation_config: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Send a query to the Gemini LLM, reusing the cached response for an identical prompt
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        tier: Model tier to use, "flash" or "pro"
+        stream: Receive the response in chunks as it is generated, for long responses
+        generation_config: Optional Gemini generation config, e.g. for JSON output
+        
+    Returns:
+        The LLM's response as a string
+    """
+    return await query_llm(prompt, tier, stream, generation_config)
+
+def _parse_function_call(response: str) -> Optional[Tuple[str, str]]:
+    """
+    Parse an agent response into a function name and its parameters
+    
+    Args:
+        response: JSON response from the LLM, or the plain-text FUNCTION_CALL format
+        
+    Returns:
+        Tuple of function name and parameters, or None if the response is neither
+    """
+    try:
+        parsed = orjson.loads(response)
+        func_name, params = parsed["function"], parsed["params"]
+        if isinstance(func_name, str) and isinstance(params, str):
+            return func_name, params
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        pass
+    
+    match = _FC_RE.search(response)
+    return (match.group(1), match.group(2).strip()) if match else None
+
+def _digest(result: Any, limit: int = _DIGEST_CHARS) -> str:
+    """Render a function result as JSON, truncated to `limit` characters"""
+    text = result if isinstance(result, str) else orjson.dumps(result, default=str).decode()
+    return text[:limit] + "..." if len(text) > limit else text
+
 class StockAnalysisAgent:
     """
     Agent for executing multi-step stock analysis using Gemini LLM
     This follows the pattern from Session3.ipynb
+    
+    Only the last `history_window` iteration responses are resent in full;
+    earlier function calls are summarized by a compact digest of their results.
+    Pass AGENT_JSON_GENERATION_CONFIG as `generation_config` when the system
+    prompt asks for JSON responses.
     """
-    def __init__(self, max_iterations=5):
+    def __init__(self, max_iterations=5, history_window=2, generation_config=None):
         self.max_iterations = max_iterations
+        self.history_window = history_window
+        self.generation_config = generation_config
         self.system_prompt = ""
         self.current_query = ""
         self.iteration = 0
         self.iteration_results = []
         self.iteration_responses = []
+        self.iteration_digests = []
+        self.called_functions = []
+        self._call_results = {}
     
     def set_system_prompt(self, system_prompt: str):
         """Set the system prompt for the agent"""
@@ -50,7 +174,8 @@ class StockAnalysisAgent:
         Execute a single iteration of the agent's workflow
         
         Args:
-            function_map: Dictionary mapping function names to callables
+            function_map: Dictionary mapping function names to callables;
+                awaitable results (e.g. prefetched tasks) are awaited
         
         Returns:
             Response from the LLM or function result
@@ -59,44 +184,64 @@ class StockAnalysisAgent:
             return "Maximum iterations reached"
         
         self.iteration += 1
-        print(f"\n--- Iteration {self.iteration} ---")
+        logger.debug("--- Iteration %d ---", self.iteration)
         
-        # Construct prompt with history if needed
+        # Construct prompt with bounded history if needed
+        context_parts = [self.current_query]
         if len(self.iteration_responses) > 0:
-            prompt_context = self.current_query + "\n\n" + "\n".join(self.iteration_responses)
-            prompt_context += "\nWhat should I do next?"
-        else:
-            prompt_context = self.current_query
+            context_parts.append("\n\n")
+            if len(self.iteration_responses) > self.history_window and self.called_functions:
+                context_parts.append(f"Functions called so far: {', '.join(self.called_functions)}\n")
+                earlier = [digest for digest in self.iteration_digests[:-self.history_window] if digest]
+                if earlier:
+                    context_parts.append(f"Earlier results: {'; '.join(earlier)}\n")
+            context_parts.append("\n".join(self.iteration_responses[-self.history_window:]))
+            context_parts.append("\nWhat should I do next?")
+        prompt_context = "".join(context_parts)
         
         # Get model's response
         prompt = f"{self.system_prompt}\n\nQuery: {prompt_context}"
-        response = await query_llm(prompt)
+        response = await cached_query_llm(prompt, generation_config=self.generation_config)
         
-        print(f"LLM Response: {response}")
+        logger.debug("LLM Response: %s", response)
         
         # Check if it's a function call or final answer
-        if function_map and "FUNCTION_CALL:" in response:
-            parts = response.split("FUNCTION_CALL:", 1)[1].strip()
-            func_name, params = [x.strip() for x in parts.split("|", 1)]
+        call = _parse_function_call(response)
+        if call is not None and call[0] == "FINAL_ANALYSIS":
+            # Keep the FINAL_ANALYSIS text form that completion markers look for
+            response = f"FINAL_ANALYSIS: {call[1]}"
+        elif function_map and call is not None:
+            func_name, params = call
             
             if func_name in function_map:
-                result = function_map[func_name](params)
-                print(f"  Result: {result}")
+                # Reuse the result if the LLM repeats an earlier call
+                if (func_name, params) in self._call_results:
+                    result = self._call_results[(func_name, params)]
+                else:
+                    result = function_map[func_name](params)
+                    if inspect.isawaitable(result):
+                        result = await result
+                    self._call_results[(func_name, params)] = result
+                logger.debug("  Result: %s", result)
                 
                 # Store the result
+                self.called_functions.append(func_name)
                 self.iteration_results.append(result)
                 self.iteration_responses.append(
                     f"In iteration {self.iteration} you called {func_name} with {params} parameters, "
                     f"and the function returned {result}."
                 )
+                self.iteration_digests.append(f"{func_name} returned {_digest(result)}")
                 return result
             else:
                 error = f"Function {func_name} not found"
                 self.iteration_responses.append(error)
+                self.iteration_digests.append(None)
                 return error
         
         # If it's not a function call, just return the response
         self.iteration_responses.append(response)
+        self.iteration_digests.append(None)
         return response
     
     async def run_until_completion(self, function_map=None, completion_marker="FINAL"):
@@ -115,8 +260,8 @@ class StockAnalysisAgent:
             
             # Check if we've reached completion
             if completion_marker in str(result):
-                print("\n=== Agent Execution Complete ===")
+                logger.debug("=== Agent Execution Complete ===")
                 return result
         
-        print("\n=== Maximum iterations reached ===")
+        logger.debug("=== Maximum iterations reached ===")
         return "Maximum iterations reached without completion" 
\ No newline at end of file
@@ -0,0 +1,222 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import google.generativeai as genai
+import numpy as np
+from app.utils.config import CACHE_DIR, LLM_SEMANTIC_CACHE
+
+logger = logging.getLogger(__name__)
+
+_EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Limit concurrent Gemini requests, completions and embeddings alike, to stay
+# within rate limits
+query_semaphore = asyncio.Semaphore(4)
+
+class LLMResponseCache:
+    """
+    Exact-match cache of LLM responses
+
+    Recent entries are kept in an in-memory LRU; every entry is also written
+    to SQLite so responses survive restarts. Entries expire after the TTL.
+    """
+    def __init__(self, path: str, capacity: int = 1000, ttl: float = 86400):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, response TEXT, ts REAL)"
+            )
+            self._db.execute("DELETE FROM cache WHERE ts < ?", (time.time() - ttl,))
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None if missing or expired"""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            response, ts = entry
+            if now - ts < self.ttl:
+                self._memory.move_to_end(key)
+                return response
+            del self._memory[key]
+
+        row = self._db.execute("SELECT response, ts FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] >= self.ttl:
+            return None
+
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """Cache a response in memory and on disk"""
+        ts = time.time()
+        self._remember(key, response, ts)
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, response, ts))
+
+    def clear(self) -> None:
+        """Remove all cached responses"""
+        self._memory.clear()
+        with self._db:
+            self._db.execute("DELETE FROM cache")
+
+    def _remember(self, key: str, response: str, ts: float) -> None:
+        self._memory[key] = (response, ts)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+class SemanticLLMCache:
+    """
+    LLM response cache matched by prompt embedding similarity
+
+    Catches near-duplicate prompts that miss the exact-match cache. Prompts
+    are embedded with the Gemini embedding endpoint; normalized vectors are
+    kept in one contiguous array so a lookup is a single matrix-vector
+    product. Entries only match within the same scope (the query options,
+    such as the model tier). Prompts that differ only in a ticker or a few
+    figures can still score above the threshold, so this cache is opt-in.
+    """
+    def __init__(self, path: str, dim: int = 768, capacity: int = 1000, threshold: float = 0.95):
+        self.path = path
+        self.capacity = capacity
+        self.threshold = threshold
+        self.vecs = np.empty((0, dim), dtype=np.float32)
+        self.scopes: List[str] = []
+        self.responses: List[str] = []
+
+        if os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json"):
+            self.vecs = np.load(f"{path}.npy")
+            with open(f"{path}.json") as f:
+                entries = json.load(f)
+            self.scopes = [entry["scope"] for entry in entries]
+            self.responses = [entry["response"] for entry in entries]
+
+    async def embed(self, prompt: str) -> Optional[np.ndarray]:
+        """Return the normalized embedding of a prompt, or None if embedding failed"""
+        try:
+            async with query_semaphore:
+                result = await genai.embed_content_async(model=_EMBEDDING_MODEL, content=prompt)
+        except Exception as e:
+            logger.error("Error embedding prompt: %s", e)
+            return None
+
+        vec = np.asarray(result['embedding'], dtype=np.float32)
+        return vec / np.linalg.norm(vec)
+
+    def lookup(self, vec: np.ndarray, scope: str) -> Optional[str]:
+        """Return the response of the most similar cached prompt in scope above the threshold"""
+        if not self.responses:
+            return None
+
+        scores = np.where(np.array(self.scopes) == scope, self.vecs @ vec, -1.0)
+        best = int(scores.argmax())
+        return self.responses[best] if scores[best] >= self.threshold else None
+
+    def add(self, vec: np.ndarray, scope: str, response: str) -> None:
+        """Cache a response under a prompt embedding, evicting the oldest beyond capacity"""
+        self.vecs = np.vstack([self.vecs, vec])[-self.capacity:]
+        self.scopes = (self.scopes + [scope])[-self.capacity:]
+        self.responses = (self.responses + [response])[-self.capacity:]
+
+    def save(self) -> None:
+        """Persist the cached embeddings and responses"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        np.save(f"{self.path}.npy", self.vecs)
+        with open(f"{self.path}.json", "w") as f:
+            json.dump([{"scope": scope, "response": response} for scope, response in zip(self.scopes, self.responses)], f)
+
+_cache = LLMResponseCache(os.path.join(CACHE_DIR, "llm.sqlite3"))
+_semantic_cache = SemanticLLMCache(os.path.join(CACHE_DIR, "llm_semantic")) if LLM_SEMANTIC_CACHE else None
+_locks: Dict[str, asyncio.Lock] = {}
+
+def prompt_key(prompt: str, scope: str = "") -> str:
+    """Return the cache key for a prompt sent with the given query options"""
+    return hashlib.sha256(f"{scope}\0{prompt}".encode()).hexdigest()
+
+def llm_response_cache(ignore: Tuple[str, ...] = ()) -> Callable:
+    """
+    Cache the responses of an async LLM query function
+
+    Responses are keyed on the prompt together with the function's other
+    arguments (e.g. the model tier), with defaults applied. Lookups try the
+    exact-match cache, then the semantic cache when enabled with
+    LLM_SEMANTIC_CACHE=1. Concurrent calls with the same key wait on a single
+    in-flight query. Error responses are not cached so the next call retries.
+
+    Args:
+        ignore: Names of arguments that don't affect the response text, left out of the key
+
+    Returns:
+        Decorator for an async function taking a prompt and returning the response text
+    """
+    def decorator(func: Callable[..., Awaitable[str]]) -> Callable[..., Awaitable[str]]:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> str:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            options: Dict[str, Any] = {name: value for name, value in bound.arguments.items() if name not in ignore}
+            prompt = options.pop("prompt")
+            scope = repr(sorted(options.items()))
+            key = prompt_key(prompt, scope)
+
+            cached = _cache.get(key)
+            if cached is not None:
+                return cached
+
+            lock = _locks.setdefault(key, asyncio.Lock())
+            try:
+                async with lock:
+                    cached = _cache.get(key)
+                    if cached is not None:
+                        return cached
+
+                    vec = None
+                    if _semantic_cache is not None:
+                        vec = await _semantic_cache.embed(prompt)
+                        if vec is not None:
+                            cached = _semantic_cache.lookup(vec, scope)
+                            if cached is not None:
+                                return cached
+
+                    response = await func(*args, **kwargs)
+                    if not response.startswith("Error:"):
+                        _cache.set(key, response)
+                        if vec is not None:
+                            _semantic_cache.add(vec, scope, response)
+                    return response
+            finally:
+                if _locks.get(key) is lock and not lock.locked():
+                    del _locks[key]
+
+        return wrapper
+
+    return decorator
+
+def clear_llm_cache() -> None:
+    """Clear all cached LLM responses"""
+    _cache.clear()
+    if _semantic_cache is not None:
+        _semantic_cache.vecs = _semantic_cache.vecs[:0]
+        _semantic_cache.scopes = []
+        _semantic_cache.responses = []
+
+def save_semantic_cache() -> None:
+    """Persist the semantic cache, if enabled"""
+    if _semantic_cache is not None:
+        _semantic_cache.save()